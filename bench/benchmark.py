@@ -0,0 +1,368 @@
+"""Run the bot against the local mock site and report where the time goes.
+
+Reports per-phase latency percentiles, Playwright protocol calls per minute and the CPU and RSS of
+the bot's process tree (Python, the Playwright driver and Chromium) over time.
+
+    python bench/benchmark.py --duration 300 --lobbies 2
+    python bench/benchmark.py --duration 300 --lobbies 2 --lean --json lean.json
+    python bench/benchmark.py --duration 300 --lobbies 2 --compare
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR))
+sys.path.insert(0, str(BENCH_DIR.parent / 'src'))
+
+from mock_happyslap import MockHappySlapServer, MockScenario
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    # Nearest-rank percentile
+    index = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def process_tree(root_pid=None):
+    """A process and all its descendants. Linux only, returns None elsewhere."""
+    root_pid = root_pid or os.getpid()
+    proc = Path('/proc')
+    if not proc.exists():
+        return None
+
+    children = defaultdict(list)
+    for stat in proc.glob('[0-9]*/stat'):
+        try:
+            fields = stat.read_text().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        children[int(fields[1])].append(int(stat.parent.name))
+
+    pids = []
+    pending = [root_pid]
+    while pending:
+        pid = pending.pop()
+        pids.append(pid)
+        pending.extend(children.get(pid, []))
+    return pids
+
+
+def process_tree_rss_mb(root_pid=None):
+    pids = process_tree(root_pid)
+    if pids is None:
+        return None
+
+    total_kb = 0
+    for pid in pids:
+        try:
+            for line in Path(f'/proc/{pid}/status').read_text().splitlines():
+                if line.startswith('VmRSS:'):
+                    total_kb += int(line.split()[1])
+                    break
+        except OSError:
+            continue
+    return total_kb / 1024
+
+
+def process_tree_cpu_seconds(root_pid=None):
+    """User plus system CPU time of the live processes in the tree."""
+    pids = process_tree(root_pid)
+    if pids is None:
+        return None
+
+    ticks = 0
+    for pid in pids:
+        try:
+            fields = Path(f'/proc/{pid}/stat').read_text().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        ticks += int(fields[11]) + int(fields[12])  # utime, stime
+    return ticks / os.sysconf('SC_CLK_TCK')
+
+
+def count_protocol_calls(counter):
+    """Count every call the client sends to the Playwright driver, by method name."""
+    from playwright._impl._connection import Connection
+
+    send = Connection._send_message_to_server
+
+    def counted(self, object, method, *args, **kwargs):
+        counter[method] += 1
+        return send(self, object, method, *args, **kwargs)
+
+    Connection._send_message_to_server = counted
+
+
+class Recorder:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.phases = defaultdict(list)
+        self.rss = []
+        self.cpu = []
+        self.protocol_calls = Counter()
+
+    def record(self, phase, seconds):
+        self.phases[phase].append(seconds)
+
+    async def sample_resources(self, interval):
+        while True:
+            elapsed = time.monotonic() - self.started
+            rss = process_tree_rss_mb()
+            if rss is not None:
+                self.rss.append((elapsed, rss))
+            cpu = process_tree_cpu_seconds()
+            if cpu is not None:
+                self.cpu.append((elapsed, cpu))
+            await asyncio.sleep(interval)
+
+    def cpu_percent(self):
+        """Average CPU use between the first and last sample, 100 being one core."""
+        if len(self.cpu) < 2:
+            return None
+        (first_at, first), (last_at, last) = self.cpu[0], self.cpu[-1]
+        return 100 * (last - first) / (last_at - first_at)
+
+    def summary(self):
+        minutes = (time.monotonic() - self.started) / 60
+        return {
+            'minutes': minutes,
+            'phases': {
+                phase: {
+                    'count': len(values),
+                    'p50': percentile(values, 50),
+                    'p90': percentile(values, 90),
+                    'p99': percentile(values, 99),
+                    'max': max(values),
+                }
+                for phase, values in sorted(self.phases.items())
+            },
+            'protocol_calls': sum(self.protocol_calls.values()),
+            'protocol_calls_per_minute': sum(self.protocol_calls.values()) / minutes if minutes else 0,
+            'top_protocol_calls': self.protocol_calls.most_common(10),
+            'cpu_percent': self.cpu_percent(),
+            'rss_mb': self.rss,
+        }
+
+
+def configure_environment(args, base_url, workdir):
+    # Pin every setting the bot reads: load_dotenv() never overrides these, so a local .env can't
+    # skew the run
+    os.environ.update({
+        'HAPPYSLAP_URL': base_url,
+        'EMAIL': 'bench@example.com',
+        'PASSWORD': 'bench',
+        'LOBBY_COUNT': str(args.lobbies),
+        'MAX_CONCURRENT_LOBBIES': str(args.lobbies),
+        'SESSION_STATE_PATH': str(workdir / 'session_state.json'),
+        'SESSION_PROBE_INTERVAL': '300',
+        'CATALOG_PATH': str(workdir / 'game_catalog.json'),
+        'CATALOG_TTL': '21600',
+        'CATALOG_RECENT_WINDOW': '5',
+        'GAME_URL_TEMPLATE': '',
+        'RECYCLE_AFTER_ERRORS': '3',
+        'RECYCLE_MEMORY_MB': '512',
+        'BROWSER_MODE': args.browser_mode,
+        'BROWSER_CHANNEL': args.channel,
+        'LEAN_MODE': 'true' if args.lean else 'false',
+        'METRICS_PORT': '',
+        'METRICS_JSONL': '',
+    })
+
+
+async def run(args):
+    scenario = MockScenario(
+        page_latency=args.page_latency, search_latency=args.search_latency,
+        host_latency=args.host_latency, asset_latency=args.asset_latency,
+        join_delay=args.join_delay, players=args.players, game_seconds=args.game_seconds,
+        empty_lobby_rate=args.empty_lobby_rate, seed=args.seed)
+    server = MockHappySlapServer(('127.0.0.1', 0), scenario)
+    server.start_in_thread()
+
+    workdir = Path(tempfile.mkdtemp(prefix='happyslap-bench-'))
+    configure_environment(args, server.url, workdir)
+
+    # Imported late: the bot modules read their settings from the environment at import time
+    import bot
+    from lobby_state import LobbyState
+
+    recorder = Recorder()
+    count_protocol_calls(recorder.protocol_calls)
+
+    class TimedBot(bot.HappySlapBot):
+        def __init__(self, *a, **kw):
+            super().__init__(*a, **kw)
+            self.START_COUNTDOWN = args.start_countdown
+            self.SCORES_COUNTDOWN = args.scores_countdown
+            self.EMPTY_LOBBY_COUNTDOWN = args.scores_countdown
+            self.LOBBY_TIMEOUT = args.lobby_timeout
+            self.countdown_ended_at = None
+            self.scores_done_at = None
+            for state, handler in self.handlers.items():
+                self.handlers[state] = self.timed(state, handler)
+
+        def timed(self, state, handler):
+            async def run_state():
+                started = time.monotonic()
+                if state is LobbyState.LOBBY and self.scores_done_at:
+                    # Dead air on stream: from the end of the countdown to the next join code
+                    recorder.record('turnover', started - self.scores_done_at)
+                    self.scores_done_at = None
+                result = await handler()
+                recorder.record(state.value, time.monotonic() - started)
+                if state in (LobbyState.SCORES, LobbyState.LOBBY) and result is LobbyState.DISCOVER:
+                    # Staging may still be running after the countdown; that wait is part of the turnover
+                    self.scores_done_at = self.countdown_ended_at
+                return result
+            return run_state
+
+        async def wait_for_countdown(self, deadline):
+            try:
+                await super().wait_for_countdown(deadline)
+            finally:
+                self.countdown_ended_at = time.monotonic()
+
+    engine = bot.HostEngine(lobby_count=args.lobbies, max_concurrent=args.lobbies)
+    engine.bot_class = TimedBot
+
+    login = engine.session.login
+
+    async def timed_login(browser):
+        started = time.monotonic()
+        await login(browser)
+        recorder.record('login', time.monotonic() - started)
+
+    engine.session.login = timed_login
+
+    sampler = asyncio.create_task(recorder.sample_resources(args.sample_interval))
+    try:
+        await asyncio.wait_for(engine.start(), args.duration)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        sampler.cancel()
+        server.shutdown()
+
+    result = recorder.summary()
+    result['mock_requests'] = dict(server.requests)
+    result['settings'] = vars(args)
+    return result
+
+
+def print_report(result):
+    print(f"\n=== Benchmark: {result['minutes']:.1f} min, lean={result['settings']['lean']} ===")
+    print(f"{'phase':<12}{'count':>7}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}")
+    for phase, stats in result['phases'].items():
+        print(f"{phase:<12}{stats['count']:>7}{stats['p50']:>8.2f}s{stats['p90']:>8.2f}s"
+              f"{stats['p99']:>8.2f}s{stats['max']:>8.2f}s")
+
+    print(f"\nProtocol calls: {result['protocol_calls']} ({result['protocol_calls_per_minute']:.0f}/min)")
+    for method, count in result['top_protocol_calls']:
+        print(f"  {method:<32}{count:>7}")
+
+    print(f"\nMock requests: {result['mock_requests']}")
+
+    if result['cpu_percent'] is not None:
+        print(f"\nCPU: {result['cpu_percent']:.0f}% of one core on average")
+
+    rss = result['rss_mb']
+    if rss:
+        values = [mb for _, mb in rss]
+        print(f"\nRSS: start {values[0]:.0f}MB, max {max(values):.0f}MB, end {values[-1]:.0f}MB")
+        step = max(1, len(rss) // 10)
+        for elapsed, mb in rss[::step]:
+            print(f"  {elapsed:>7.0f}s {mb:>8.0f}MB")
+
+
+def comparison_rows(before, after):
+    rows = []
+    for phase in ('login', 'discover', 'hosting', 'lobby', 'turnover'):
+        for pct in ('p50', 'p90'):
+            values = [result['phases'].get(phase, {}).get(pct) for result in (before, after)]
+            rows.append((f"{phase} {pct} (s)", *values))
+    rss = [[mb for _, mb in result['rss_mb']] for result in (before, after)]
+    rows.append(('cpu (% of a core)', before['cpu_percent'], after['cpu_percent']))
+    rows.append(('rss max (MB)', *(max(values, default=None) for values in rss)))
+    rows.append(('rss end (MB)', *(values[-1] if values else None for values in rss)))
+    rows.append(('protocol calls/min', before['protocol_calls_per_minute'], after['protocol_calls_per_minute']))
+    rows.append(('asset requests', *(r['mock_requests'].get('asset', 0) for r in (before, after))))
+    return rows
+
+
+def print_comparison(before, after):
+    print(f"\n=== LEAN_MODE=false vs LEAN_MODE=true ({before['minutes']:.1f} min each) ===")
+    print(f"{'':<22}{'before':>10}{'after':>10}{'change':>9}")
+    for name, old, new in comparison_rows(before, after):
+        if old is None or new is None:
+            print(f"{name:<22}{'-' if old is None else f'{old:.2f}':>10}{'-' if new is None else f'{new:.2f}':>10}")
+            continue
+        change = f"{100 * (new - old) / old:+.0f}%" if old else ''
+        print(f"{name:<22}{old:>10.2f}{new:>10.2f}{change:>9}")
+
+
+def compare(argv):
+    """Run the same scenario without and with lean mode, each in its own process."""
+    results = []
+    for lean in (False, True):
+        fd, path = tempfile.mkstemp(prefix='happyslap-bench-', suffix='.json')
+        os.close(fd)
+        # A fresh process per run: the bot modules read their settings at import time
+        subprocess.run([sys.executable, __file__, *argv, '--json', path] + (['--lean'] if lean else []), check=True)
+        results.append(json.loads(Path(path).read_text()))
+        os.unlink(path)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--duration', type=float, default=300, help="seconds to run the bot")
+    parser.add_argument('--lobbies', type=int, default=1)
+    parser.add_argument('--lean', action='store_true', help="run with LEAN_MODE=true")
+    parser.add_argument('--browser-mode', default='headless')
+    parser.add_argument('--channel', default='', help="browser channel, empty for bundled Chromium")
+    parser.add_argument('--start-countdown', type=int, default=5)
+    parser.add_argument('--scores-countdown', type=int, default=5)
+    parser.add_argument('--lobby-timeout', type=int, default=30)
+    parser.add_argument('--page-latency', type=float, default=0.05)
+    parser.add_argument('--search-latency', type=float, default=0.3)
+    parser.add_argument('--host-latency', type=float, default=0.5)
+    parser.add_argument('--asset-latency', type=float, default=0.1)
+    parser.add_argument('--join-delay', type=float, default=3.0)
+    parser.add_argument('--players', type=int, default=3)
+    parser.add_argument('--game-seconds', type=float, default=10.0)
+    parser.add_argument('--empty-lobby-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--sample-interval', type=float, default=5.0)
+    parser.add_argument('--json', help="also write the results to this file")
+    parser.add_argument('--compare', action='store_true',
+                        help="run once without and once with --lean and print the two side by side")
+    args = parser.parse_args()
+
+    if args.compare:
+        argv = [f"--{name.replace('_', '-')}={value}" for name, value in vars(args).items()
+                if value is not None and name not in ('lean', 'compare', 'json')]
+        before, after = compare(argv)
+        print_comparison(before, after)
+        if args.json:
+            Path(args.json).write_text(json.dumps({'before': before, 'after': after}, indent=2))
+        return
+
+    result = asyncio.run(run(args))
+    print_report(result)
+    if args.json:
+        Path(args.json).write_text(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+"""Local stand-in for happyslap.tv with scriptable latencies and player joins.
+
+Only reproduces what src/bot.py relies on: the login form, /host, /host/discover with the
+grid-cols-3 cards, /trivia/host/<CODE>/... with the grid-cols-4 player list, the green play
+button and "Restart Game".
+
+    python bench/mock_happyslap.py --port 8765 --join-delay 3 --game-seconds 20
+"""
+import argparse
+import json
+import random
+import secrets
+import string
+import threading
+import time
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# 1x1 transparent PNG
+PIXEL_PNG = bytes.fromhex(
+    '89504e470d0a1a0a0000000d4948445200000001000000010806000000'
+    '1f15c4890000000d49444154789c6360000002000001e221bc330000000049454e44ae426082')
+
+TRIVIA_TOPICS = ['Movies', 'Music', 'Science', 'History', 'Geography', 'Sports',
+                 'Animals', 'Food', 'Video Games', 'Space', 'Art', 'Literature']
+
+
+class MockScenario:
+    def __init__(self, page_latency=0.05, search_latency=0.3, host_latency=0.5, asset_latency=0.1,
+                 join_delay=3.0, join_interval=1.0, players=3, game_seconds=20.0,
+                 empty_lobby_rate=0.0, session_ttl=None, games=12, seed=None):
+        self.page_latency = page_latency
+        self.search_latency = search_latency
+        self.host_latency = host_latency
+        self.asset_latency = asset_latency
+        self.join_delay = join_delay
+        self.join_interval = join_interval
+        self.players = players
+        self.game_seconds = game_seconds
+        self.empty_lobby_rate = empty_lobby_rate
+        self.session_ttl = session_ttl
+        self.games = [{'id': f'g{i + 1}', 'title': f'{TRIVIA_TOPICS[i % len(TRIVIA_TOPICS)]} Trivia {i + 1}'}
+                      for i in range(games)]
+        self.random = random.Random(seed)
+
+
+class MockHappySlapServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, scenario=None):
+        super().__init__(address, MockHappySlapHandler)
+        self.scenario = scenario or MockScenario()
+        self.sessions = {}
+        self.lobbies = {}
+        self.requests = {}
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, kind):
+        with self.lock:
+            self.requests[kind] = self.requests.get(kind, 0) + 1
+
+    def start_in_thread(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+class MockHappySlapHandler(BaseHTTPRequestHandler):
+    server: MockHappySlapServer
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def scenario(self):
+        return self.server.scenario
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = [p for p in url.path.split('/') if p]
+
+        if url.path == '/login':
+            return self.page('login', LOGIN_PAGE)
+        if url.path.startswith('/static/'):
+            return self.asset(url.path)
+        if url.path == '/api/games':
+            return self.search(parse_qs(url.query).get('q', [''])[0])
+
+        if not self.logged_in():
+            self.server.count('redirect_login')
+            return self.redirect('/login')
+
+        if url.path == '/host':
+            return self.page('host', HOST_PAGE)
+        if url.path == '/host/discover':
+            return self.page('discover', DISCOVER_PAGE)
+        if len(parts) == 2 and parts[0] == 'game':
+            return self.page('game', GAME_PAGE)
+        if len(parts) >= 3 and parts[:2] == ['trivia', 'host'] and parts[2] in self.server.lobbies:
+            return self.page('lobby', LOBBY_PAGE.replace('__CONFIG__', json.dumps(self.server.lobbies[parts[2]])))
+        self.send_error(404)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path == '/api/login':
+            token = secrets.token_hex(16)
+            with self.server.lock:
+                self.server.sessions[token] = time.time()
+            self.server.count('login')
+            return self.json({'ok': True}, cookie=f'hs_session={token}; Path=/')
+        if url.path == '/api/lobbies':
+            if not self.logged_in():
+                return self.json({'error': 'unauthorized'}, status=401)
+            return self.create_lobby()
+        self.send_error(404)
+
+    def logged_in(self):
+        cookie = SimpleCookie(self.headers.get('Cookie', ''))
+        if 'hs_session' not in cookie:
+            return False
+        with self.server.lock:
+            created = self.server.sessions.get(cookie['hs_session'].value)
+        if created is None:
+            return False
+        return self.scenario.session_ttl is None or time.time() - created < self.scenario.session_ttl
+
+    def page(self, kind, html):
+        self.server.count(kind)
+        time.sleep(self.scenario.page_latency)
+        body = html.encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def asset(self, path):
+        self.server.count('asset')
+        time.sleep(self.scenario.asset_latency)
+        content_type = 'font/woff2' if path.endswith('.woff2') else 'image/png'
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(PIXEL_PNG)))
+        self.end_headers()
+        self.wfile.write(PIXEL_PNG)
+
+    def search(self, query):
+        self.server.count('search')
+        time.sleep(self.scenario.search_latency)
+        results = [game for game in self.scenario.games if query.lower() in game['title'].lower()]
+        return self.json({'results': results})
+
+    def create_lobby(self):
+        self.server.count('create_lobby')
+        time.sleep(self.scenario.host_latency)
+        scenario = self.scenario
+        with self.server.lock:
+            code = ''.join(scenario.random.choice(string.ascii_uppercase + string.digits) for _ in range(5))
+            empty = scenario.random.random() < scenario.empty_lobby_rate
+            self.server.lobbies[code] = {
+                'code': code,
+                'players': 0 if empty else scenario.players,
+                'join_delay': scenario.join_delay,
+                'join_interval': scenario.join_interval,
+                'game_seconds': scenario.game_seconds,
+            }
+        return self.json({'code': code})
+
+    def redirect(self, location):
+        self.send_response(302)
+        self.send_header('Location', location)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def json(self, payload, status=200, cookie=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if cookie:
+            self.send_header('Set-Cookie', cookie)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+PAGE_HEAD = """<!doctype html>
+<html><head><meta charset="utf-8"><title>HappySlap (mock)</title>
+<style>
+@font-face { font-family: Londrina; src: url(/static/londrina.woff2); }
+.font-londrina { font-family: Londrina, sans-serif; }
+.grid { display: grid; gap: 8px; }
+.grid-cols-3 { grid-template-columns: repeat(3, 1fr); }
+.grid-cols-4 { grid-template-columns: repeat(4, 1fr); }
+</style></head><body>
+"""
+
+LOGIN_PAGE = PAGE_HEAD + """
+<input placeholder="Username or Email">
+<input placeholder="Password" type="password">
+<button id="login">Login</button>
+<script>
+document.getElementById('login').onclick = async () => {
+    await fetch('/api/login', { method: 'POST' });
+    location.href = '/host';
+};
+</script>
+</body></html>"""
+
+HOST_PAGE = PAGE_HEAD + """
+<h1>Host a game</h1>
+<a href="/host/discover">Discover</a>
+</body></html>"""
+
+DISCOVER_PAGE = PAGE_HEAD + """
+<input class="font-roboto rounded-lg" placeholder="Search games">
+<div id="results"></div>
+<script>
+const input = document.querySelector('input');
+let debounce = null;
+input.addEventListener('input', () => {
+    clearTimeout(debounce);
+    debounce = setTimeout(async () => {
+        const response = await fetch('/api/games?q=' + encodeURIComponent(input.value));
+        const { results } = await response.json();
+        const grid = document.createElement('div');
+        grid.className = 'grid grid-cols-3';
+        for (const game of results) {
+            const card = document.createElement('div');
+            card.innerHTML = `<img src="/static/cover/${game.id}.png" width="64"><p>${game.title}</p>`;
+            card.onclick = () => { location.href = '/game/' + game.id; };
+            grid.appendChild(card);
+        }
+        document.getElementById('results').replaceChildren(grid);
+    }, 300);
+});
+</script>
+</body></html>"""
+
+GAME_PAGE = PAGE_HEAD + """
+<img src="/static/banner.png" width="320">
+<button id="host">Host Game</button>
+<script>
+document.getElementById('host').onclick = async () => {
+    const response = await fetch('/api/lobbies', { method: 'POST' });
+    const { code } = await response.json();
+    location.href = `/trivia/host/${code}/lobby`;
+};
+</script>
+</body></html>"""
+
+LOBBY_PAGE = PAGE_HEAD + """
+<h1 class="text-hs-green font-londrina"></h1>
+<main id="stage">
+    <div class="grid grid-cols-4" id="players"></div>
+    <button class="generic-button bg-hs-green" id="play">Play</button>
+</main>
+<script>
+const config = __CONFIG__;
+document.querySelector('h1').innerText = config.code;
+
+let joined = 0;
+const join = () => {
+    const player = document.createElement('div');
+    player.innerText = 'Player ' + (++joined);
+    document.getElementById('players').appendChild(player);
+    if (joined < config.players) {
+        setTimeout(join, config.join_interval * 1000);
+    }
+};
+if (config.players > 0) {
+    setTimeout(join, config.join_delay * 1000);
+}
+
+document.getElementById('play').onclick = () => {
+    document.getElementById('stage').innerHTML = '<p>Question 1</p>';
+    setTimeout(() => {
+        document.getElementById('stage').innerHTML = '<p>Final scores</p><button>Restart Game</button>';
+    }, config.game_seconds * 1000);
+};
+</script>
+</body></html>"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--page-latency', type=float, default=0.05)
+    parser.add_argument('--search-latency', type=float, default=0.3)
+    parser.add_argument('--host-latency', type=float, default=0.5)
+    parser.add_argument('--asset-latency', type=float, default=0.1)
+    parser.add_argument('--join-delay', type=float, default=3.0)
+    parser.add_argument('--join-interval', type=float, default=1.0)
+    parser.add_argument('--players', type=int, default=3)
+    parser.add_argument('--game-seconds', type=float, default=20.0)
+    parser.add_argument('--empty-lobby-rate', type=float, default=0.0)
+    parser.add_argument('--session-ttl', type=float, default=None)
+    args = parser.parse_args()
+
+    scenario = MockScenario(
+        page_latency=args.page_latency, search_latency=args.search_latency,
+        host_latency=args.host_latency, asset_latency=args.asset_latency,
+        join_delay=args.join_delay, join_interval=args.join_interval, players=args.players,
+        game_seconds=args.game_seconds, empty_lobby_rate=args.empty_lobby_rate,
+        session_ttl=args.session_ttl)
+    server = MockHappySlapServer((args.host, args.port), scenario)
+    print(f"Mock HappySlap running at {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
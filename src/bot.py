@@ -1,87 +1,113 @@
-from playwright.sync_api import sync_playwright
+from playwright.async_api import async_playwright
+import asyncio
 import time
-import random
 from pathlib import Path
 import re
+from urllib.parse import urljoin
 from dotenv import load_dotenv
 import os
-from datetime import datetime, timedelta
+from lobby_watcher import LobbyWatcher
+from session_store import SessionStore, BASE_URL
+from game_catalog import GameCatalog, search_trivia, SEARCH_INPUT_SELECTOR
+from lobby_state import LobbyState, LobbyScheduler, NullSlot, SessionExpired
+from lean_mode import is_lean, launch_options, new_context
+from metrics import metrics
 
 # Load environment variables
 load_dotenv()
 
 class HappySlapBot:
-    def __init__(self):
-        self.browser = None
+    def __init__(self, browser, session, catalog, lobby_id=1, semaphore=None):
+        self.browser = browser
+        self.session = session
+        self.catalog = catalog
+        self.lobby_id = lobby_id
+        # Shared with the other lobbies: held only while logging in, searching or hosting
+        self.slot = semaphore or NullSlot()
+        self.lean = is_lean()
         self.context = None
         self.page = None
-        self.email = os.getenv('EMAIL')
-        self.password = os.getenv('PASSWORD')
-        self.last_login_time = None
-        self.LOGIN_INTERVAL = timedelta(hours=8)
-        
-        if not self.email or not self.password:
-            raise ValueError("EMAIL and PASSWORD must be set in .env file")
-
-    def start(self):
-        playwright = sync_playwright().start()
-        
-        self.browser = playwright.chromium.launch(
-            channel='chrome',
-            headless=False,
-            args=['--disable-web-security']
-        )
-
-        self.login()
-        
-        while True:
-            try:
-                if self.should_refresh_login():
-                    print("Session refresh needed - logging in again...")
-                    self.login()
-                
-                self.select_and_host_trivia_game()
-                self.announce_game()
-                time.sleep(60)
-            except Exception as e:
-                print(f"Error: {e}")
-                time.sleep(5)
-
-    def should_refresh_login(self):
-        if not self.last_login_time:
+        self.watcher = None
+        self.staged = None
+        self.next_game = None
+        self.session_version = None
+        self.LOBBY_TIMEOUT = 600
+        self.START_COUNTDOWN = 50
+        self.SCORES_COUNTDOWN = 20
+        self.EMPTY_LOBBY_COUNTDOWN = 10
+        self.handlers = {
+            LobbyState.DISCOVER: self.discover,
+            LobbyState.HOSTING: self.hosting,
+            LobbyState.LOBBY: self.lobby,
+            LobbyState.COUNTDOWN: self.start_game,
+            LobbyState.IN_GAME: self.in_game,
+            LobbyState.SCORES: self.scores,
+        }
+
+    def log(self, message):
+        print(f"[Lobby {self.lobby_id}] {message}")
+
+    def report_players(self, watcher):
+        # Staged pages report too; only the lobby on screen counts
+        if watcher is self.watcher:
+            metrics.set('happyslap_players', watcher.player_count, lobby=self.lobby_id)
+
+    async def start(self):
+        await LobbyScheduler(self, slot=self.slot).run()
+
+    async def close(self):
+        if self.staged:
+            await self.staged[0].close()
+            self.staged = None
+        if self.page:
+            await self.page.close()
+            self.page = None
+        if self.context:
+            await self.context.close()
+            self.context = None
+
+    async def should_refresh_login(self):
+        if not self.context or self.session_version != self.session.version:
             return True
-        return datetime.now() - self.last_login_time >= self.LOGIN_INTERVAL
+        return not await self.session.is_valid()
 
-    def login(self):
-        print("Resetting context and logging in...")
+    async def login(self):
+        self.log("Resetting context with stored session...")
 
         # Clean up previous context/page
-        if self.page:
-            self.page.close()
-        if self.context:
-            self.context.close()
+        await self.close()
 
-        self.context = self.browser.new_context()  # <- Fresh browser context
-        self.page = self.context.new_page()
+        # Every lobby shares the one login kept by the session store
+        state = await self.session.get_state(self.browser)
+        self.session_version = self.session.version
 
-        self.page.goto("https://happyslap.tv/login")
-        self.page.wait_for_selector("input[placeholder='Username or Email']")
-        
-        print(f"Using email: {self.email}")
-        self.page.fill("input[placeholder='Username or Email']", self.email)
-        self.page.fill("input[placeholder='Password']", self.password)
-        self.page.click("button:has-text('Login')")
+        self.context = await new_context(self.browser, storage_state=state)  # <- Fresh context, shared browser
+        self.page = await self.context.new_page()
+        self.watcher = LobbyWatcher(self.page, on_change=self.report_players)
+        await self.watcher.install()
 
+    async def reset_page(self):
+        if self.staged:
+            await self.staged[0].close()
+            self.staged = None
+        if self.page:
+            await self.page.close()
+        self.page = await self.context.new_page()
+        self.watcher = LobbyWatcher(self.page, on_change=self.report_players)
+        await self.watcher.install()
+
+    async def renderer_memory_mb(self):
+        if not self.page:
+            return 0
+        client = await self.context.new_cdp_session(self.page)
         try:
-            self.page.wait_for_url("https://happyslap.tv/host", timeout=5000)
-            print("Login successful!")
-            self.last_login_time = datetime.now()
-        except Exception as e:
-            print("Login failed!")
-            raise e
+            usage = await client.send('Runtime.getHeapUsage')
+        finally:
+            await client.detach()
+        return usage['usedSize'] / (1024 * 1024)
 
-    def inject_countdown_overlay(self):
-        self.page.evaluate("""() => {
+    async def inject_countdown_overlay(self):
+        await self.page.evaluate("""() => {
             if (!document.getElementById('countdown-overlay')) {
                 const overlay = document.createElement('div');
                 overlay.id = 'countdown-overlay';
@@ -98,108 +124,298 @@ class HappySlapBot:
                 `;
                 document.body.appendChild(overlay);
             }
-        }""")
-
-    def update_countdown(self, text):
-        self.page.evaluate(f"""text => {{
-            document.getElementById('countdown-overlay').innerText = text;
-        }}""", text)
-
-    def select_and_host_trivia_game(self):
-        print("Finding a trivia game...")
-        self.page.goto("https://happyslap.tv/host/discover")
-        self.page.wait_for_load_state('networkidle')
-
-        search_input = self.page.wait_for_selector('input[class*="font-roboto"][class*="rounded-lg"]')
-        print("Found search input, filling with 'Trivia'...")
-        search_input.fill("Trivia")
-
-        print("Searching for Trivia games...")
-        self.page.wait_for_timeout(1500)
-
-        self.page.wait_for_selector('[class*="grid-cols-3"]')
-        game_cards = self.page.query_selector_all('[class*="grid-cols-3"] > div')
-        if not game_cards:
-            raise Exception("No trivia games found")
-
-        random.choice(game_cards).click()
+            if (window.__happyslapOverlay) {
+                return;
+            }
 
-        host_button = self.page.wait_for_selector('button:has-text("Host Game")')
-        host_button.click()
+            // The countdown ticks in the page itself; Python only starts it and awaits `done`
+            let timer = null;
+            let finish = () => {};
+            const overlay = {
+                done: Promise.resolve(),
+                set(text) {
+                    clearInterval(timer);
+                    finish();
+                    document.getElementById('countdown-overlay').innerText = text;
+                },
+                start(deadline, label, doneText) {
+                    this.set('');
+                    this.done = new Promise(resolve => { finish = resolve; });
+                    let shown = null;
+                    const tick = () => {
+                        const remaining = Math.ceil((deadline - Date.now()) / 1000);
+                        if (remaining <= 0) {
+                            this.set(doneText || '');
+                            return;
+                        }
+                        // Ticks are 200ms apart; only touch the DOM when the number changes
+                        if (remaining !== shown) {
+                            shown = remaining;
+                            document.getElementById('countdown-overlay').innerText = `${label}: ${remaining}s`;
+                        }
+                    };
+                    tick();
+                    timer = setInterval(tick, 200);
+                },
+            };
+            window.__happyslapOverlay = overlay;
+        }""")
 
-        self.page.wait_for_url(re.compile(r"https://happyslap.tv/trivia/host/[A-Z0-9]{5}/.*"))
-        self.page.wait_for_load_state('networkidle')
-        time.sleep(2)
+    async def update_countdown(self, text):
+        await self.page.evaluate("text => window.__happyslapOverlay.set(text)", text)
+
+    async def start_countdown(self, label, seconds, done_text=None):
+        deadline = (time.time() + seconds) * 1000
+        await self.page.evaluate(
+            "([deadline, label, doneText]) => window.__happyslapOverlay.start(deadline, label, doneText)",
+            [deadline, label, done_text])
+        return deadline
+
+    async def wait_for_countdown(self, deadline):
+        # One round-trip: resolves when the in-page timer hits zero
+        timeout = max(deadline / 1000 - time.time(), 0) + 5
+        await asyncio.wait_for(self.page.evaluate("() => window.__happyslapOverlay.done"), timeout)
+
+    async def countdown(self, label, seconds, done_text=None):
+        deadline = await self.start_countdown(label, seconds, done_text)
+        await self.wait_for_countdown(deadline)
+
+    def check_logged_in(self, page):
+        if '/login' in page.url:
+            self.session.invalidate(self.session_version)
+            raise SessionExpired("Session expired - redirected to login")
+
+    async def open_discover(self, page):
+        await page.goto(f"{BASE_URL}/host/discover")
+        if self.lean:
+            # Ready as soon as either the search box or a login redirect shows up
+            await page.locator(SEARCH_INPUT_SELECTOR).or_(
+                page.locator("input[placeholder='Username or Email']")).first.wait_for()
+        else:
+            await page.wait_for_load_state('networkidle')
+        self.check_logged_in(page)
 
-        url_parts = self.page.url.split('/')
+    async def open_game(self, page, game, on_results=False):
+        """Get to the page with the "Host Game" button, directly when the game's URL is known."""
+        if game.get('url'):
+            url = urljoin(BASE_URL + '/', game['url'])
+            try:
+                if not url.startswith(BASE_URL + '/'):
+                    raise Exception(f"{url} is not on {BASE_URL}")
+                await page.goto(url)
+                self.check_logged_in(page)
+                return await page.wait_for_selector('button:has-text("Host Game")', timeout=10000)
+            except SessionExpired:
+                raise
+            except Exception:
+                self.log(f"Stored URL for '{game['title']}' stopped working, using discover instead")
+                self.catalog.set_url(game['id'], None)
+
+        if not on_results:
+            await self.open_discover(page)
+            await search_trivia(page)
+
+        card = await self.catalog.find_card(page, game)
+        discover_url = page.url
+        await card.click()
+        host_button = await page.wait_for_selector('button:has-text("Host Game")')
+        if page.url != discover_url:
+            self.catalog.set_url(game['id'], page.url)
+        return host_button
+
+    async def pick_game(self, page):
+        """Choose the next game, refreshing the catalog first if it is stale. Returns (game, on_results)."""
+        self.log("Finding a trivia game...")
+        on_results = False
+        if not self.catalog.is_fresh():
+            await self.open_discover(page)
+            on_results = await self.catalog.refresh(page)
+
+        game = self.catalog.choose()
+        self.log(f"Picked '{game['title']}'")
+        return game, on_results
+
+    async def open_lobby(self, page, game, on_results=False):
+        """Host the given game on the page. Returns the join code."""
+        host_button = await self.open_game(page, game, on_results=on_results)
+        await host_button.click()
+        self.catalog.record_played(game['id'])
+
+        with metrics.timer('host_transition', lobby=self.lobby_id):
+            await page.wait_for_url(re.compile(re.escape(BASE_URL) + r"/trivia/host/[A-Z0-9]{5}/.*"))
+            if self.lean:
+                # The join code heading is rendered once the lobby is live
+                try:
+                    await page.wait_for_selector('h1.text-hs-green.font-londrina', timeout=10000)
+                except Exception:
+                    self.log("Join code heading not found, continuing anyway")
+            else:
+                await page.wait_for_load_state('networkidle')
+                await asyncio.sleep(2)
+        metrics.inc('happyslap_games_hosted_total', lobby=self.lobby_id)
+
+        url_parts = page.url.split('/')
         join_code_index = url_parts.index('host') + 1
         if join_code_index < len(url_parts):
-            self.current_join_code = url_parts[join_code_index]
-            print(f"Join Code: {self.current_join_code}")
-        else:
-            join_code_element = self.page.query_selector('h1.text-hs-green.font-londrina')
-            if join_code_element:
-                self.current_join_code = join_code_element.inner_text()
-                print(f"Join Code: {self.current_join_code}")
-
-        self.inject_countdown_overlay()
-
-        initial_player_count = len(self.page.query_selector_all('[class*="grid-cols-4"] > div'))
-        if initial_player_count > 0:
-            print("Waiting for player list to reset...")
-            while len(self.page.query_selector_all('[class*="grid-cols-4"] > div')) > 0:
-                time.sleep(0.5)
-
-        lobby_start_time = time.time()
-        player_joined = False
-        game_started = False
-        print("Lobby ready - waiting for players...")
-
-        while True:
-            restart_button = self.page.query_selector('text="Restart Game"')
-            if restart_button:
-                print("Game ended - showing scores...")
-                for i in range(20, 0, -1):
-                    self.update_countdown(f'Finding new game in: {i}s')
-                    time.sleep(1)
-                return self.select_and_host_trivia_game()
-
-            if game_started:
-                time.sleep(1)
-                continue
-
-            player_count = len(self.page.query_selector_all('[class*="grid-cols-4"] > div'))
-            if time.time() - lobby_start_time > 600 and player_count == 0:
-                print("Lobby timeout - no players for 10 minutes")
-                for i in range(10, 0, -1):
-                    self.update_countdown(f'Empty lobby - Finding new game in: {i}s')
-                    time.sleep(1)
-                return self.select_and_host_trivia_game()
-
-            if player_count > 0 and not player_joined:
-                print(f"First player joined! Starting countdown...")
-                player_joined = True
-
-                for i in range(50, 0, -1):
-                    self.update_countdown(f'Starting in: {i}s')
-                    time.sleep(1)
-
-                play_button = self.page.query_selector('[class*="generic-button"][class*="bg-hs-green"]')
-                if play_button:
-                    self.update_countdown('Game in progress...')
-                    play_button.click()
-                    game_started = True
-
-            time.sleep(1)
+            return url_parts[join_code_index]
+        join_code_element = await page.query_selector('h1.text-hs-green.font-londrina')
+        if join_code_element:
+            return await join_code_element.inner_text()
+        return None
+
+    async def host_game(self, page):
+        game, on_results = await self.pick_game(page)
+        return await self.open_lobby(page, game, on_results)
+
+    async def stage_next_game(self):
+        """Host the next game on a background page while the current one is still on screen."""
+        page = await self.context.new_page()
+        await self.page.bring_to_front()  # keep the scoreboard visible on stream
+        watcher = LobbyWatcher(page, on_change=self.report_players)
+        try:
+            await watcher.install()
+            async with self.slot:
+                join_code = await self.host_game(page)
+        except BaseException:
+            await page.close()
+            raise
+        return page, watcher, join_code
+
+    async def countdown_while_staging(self, seconds, label):
+        # Use the on-screen countdown to get the next lobby ready off-screen
+        deadline = await self.start_countdown(label, seconds)
+        staging = asyncio.create_task(self.stage_next_game())
+        try:
+            await self.wait_for_countdown(deadline)
+        except BaseException:
+            staging.cancel()
+            raise
+
+        try:
+            self.staged = await staging
+            self.log(f"Next game staged - join code {self.staged[2]}")
+        except Exception as e:
+            self.log(f"Could not stage next game, hosting it in place: {e}")
+            self.staged = None
+
+    async def swap_to_staged(self):
+        page, watcher, join_code = self.staged
+        self.staged = None
+        old_page = self.page
+        await page.bring_to_front()
+        self.page, self.watcher = page, watcher
+        await old_page.close()
+        return join_code
+
+    async def discover(self):
+        if self.staged:
+            self.current_join_code = await self.swap_to_staged()
+            return LobbyState.LOBBY
+        self.next_game = await self.pick_game(self.page)
+        return LobbyState.HOSTING
+
+    async def hosting(self):
+        game, on_results = self.next_game
+        # A retry starts from wherever the failed attempt left the page, not from the search results
+        self.next_game = (game, False)
+        self.current_join_code = await self.open_lobby(self.page, game, on_results)
+        self.next_game = None
+        return LobbyState.LOBBY
+
+    async def lobby(self):
+        if self.current_join_code:
+            self.log(f"Join Code: {self.current_join_code}")
+        self.announce_game()
+
+        await self.inject_countdown_overlay()
+        await self.watcher.attach()
+
+        if self.watcher.player_count > 0:
+            self.log("Waiting for player list to reset...")
+            await self.watcher.wait_for(lambda w: w.player_count == 0)
+
+        self.log("Lobby ready - waiting for players...")
+        lobby_ready_time = time.monotonic()
+        lobby_active = await self.watcher.wait_for(
+            lambda w: w.game_ended or w.player_count > 0, timeout=self.LOBBY_TIMEOUT)
+
+        if not lobby_active:
+            self.log(f"Lobby timeout - no players for {self.LOBBY_TIMEOUT / 60:g} minutes")
+            metrics.inc('happyslap_lobby_timeouts_total', lobby=self.lobby_id)
+            await self.countdown_while_staging(self.EMPTY_LOBBY_COUNTDOWN, 'Empty lobby - Finding new game in')
+            return LobbyState.DISCOVER
+
+        if self.watcher.game_ended:
+            return LobbyState.SCORES
+        self.log(f"First player joined! Starting countdown...")
+        metrics.observe('happyslap_phase_seconds', time.monotonic() - lobby_ready_time,
+                        phase='lobby_fill', outcome='ok', lobby=self.lobby_id)
+        return LobbyState.COUNTDOWN
+
+    async def start_game(self):
+        await self.countdown('Starting in', self.START_COUNTDOWN)
+
+        play_button = await self.page.query_selector('[class*="generic-button"][class*="bg-hs-green"]')
+        if play_button:
+            await self.update_countdown('Game in progress...')
+            await play_button.click()
+        return LobbyState.IN_GAME
+
+    async def in_game(self):
+        await self.watcher.wait_for(lambda w: w.game_ended)
+        return LobbyState.SCORES
+
+    async def scores(self):
+        self.log("Game ended - showing scores...")
+        metrics.inc('happyslap_games_completed_total', lobby=self.lobby_id)
+        await self.countdown_while_staging(self.SCORES_COUNTDOWN, 'Finding new game in')
+        return LobbyState.DISCOVER
 
     def announce_game(self):
         if hasattr(self, 'current_join_code'):
             print(f"""
-New game started!
+New game started! (lobby {self.lobby_id})
 Join code: {self.current_join_code}
 HappySlap.tv - The best place for party games!
             """)
 
+
+class HostEngine:
+    """Hosts several lobbies from one shared Chromium process, one context per lobby.
+
+    Every lobby runs. max_concurrent only caps how many of them log in, search or host a game at
+    once; a lobby waiting for players or running a game doesn't count against it.
+    """
+
+    def __init__(self, lobby_count=None, max_concurrent=None):
+        self.lobby_count = lobby_count or int(os.getenv('LOBBY_COUNT', '1'))
+        self.max_concurrent = max_concurrent or int(os.getenv('MAX_CONCURRENT_LOBBIES', str(self.lobby_count)))
+        self.browser = None
+        self.session = SessionStore()
+        self.catalog = GameCatalog()
+        self.bot_class = HappySlapBot
+        self.bots = []
+
+        if self.lobby_count < 1 or self.max_concurrent < 1:
+            raise ValueError("LOBBY_COUNT and MAX_CONCURRENT_LOBBIES must be at least 1")
+
+    async def start(self):
+        metrics.configure_from_env()
+        async with async_playwright() as playwright:
+            self.browser = await playwright.chromium.launch(**launch_options())
+
+            semaphore = asyncio.Semaphore(self.max_concurrent)
+            self.bots = [self.bot_class(self.browser, self.session, self.catalog, lobby_id=i + 1, semaphore=semaphore)
+                         for i in range(self.lobby_count)]
+            print(f"Hosting {self.lobby_count} lobbies (at most {self.max_concurrent} hosting at once)")
+
+            try:
+                await asyncio.gather(*(bot.start() for bot in self.bots))
+            finally:
+                for bot in self.bots:
+                    await bot.close()
+                await self.browser.close()
+
 if __name__ == "__main__":
-    bot = HappySlapBot()
-    bot.start()
+    engine = HostEngine()
+    asyncio.run(engine.start())
@@ -0,0 +1,207 @@
+import asyncio
+import json
+import os
+import random
+import time
+from pathlib import Path
+from urllib.parse import unquote_plus
+
+from metrics import metrics
+
+GAME_CARD_SELECTOR = '[class*="grid-cols-3"] > div'
+SEARCH_INPUT_SELECTOR = 'input[class*="font-roboto"][class*="rounded-lg"]'
+SEARCH_TERM = "Trivia"
+
+
+def extract_games(payload):
+    """Pull {id, title} candidates out of a search JSON payload. Callers check them against the cards."""
+    games = []
+
+    def walk(node):
+        if isinstance(node, list):
+            entries = [entry for entry in map(as_game, node) if entry]
+            if entries:
+                games.extend(entries)
+                return
+            for item in node:
+                walk(item)
+        elif isinstance(node, dict):
+            for value in node.values():
+                walk(value)
+
+    walk(payload)
+    return games
+
+
+def as_game(node):
+    if not isinstance(node, dict):
+        return None
+    game_id = node.get('id') or node.get('_id') or node.get('slug')
+    title = node.get('title') or node.get('name')
+    if not game_id or not isinstance(title, str):
+        return None
+    # A URL in the payload is never trusted; URLs only come from a card click or GAME_URL_TEMPLATE
+    return {'id': str(game_id), 'title': title.strip(), 'url': None}
+
+
+def is_search_response(response):
+    if 'json' not in response.headers.get('content-type', ''):
+        return False
+    return SEARCH_TERM.lower() in unquote_plus(response.url).lower()
+
+
+async def card_title(card):
+    return (await card.inner_text()).strip().split('\n')[0].strip()
+
+
+async def search_trivia(page):
+    """Search discover for trivia and return the JSON payloads the search produced."""
+    payloads = []
+
+    async def capture(response):
+        # Only the search itself - not tags, profile or recommendation requests fired alongside it
+        if not is_search_response(response):
+            return
+        try:
+            payloads.append(await response.json())
+        except Exception:
+            pass
+
+    search_input = await page.wait_for_selector(SEARCH_INPUT_SELECTOR)
+    page.on("response", capture)
+    try:
+        with metrics.timer('discover_search'):
+            print("Searching for Trivia games...")
+            await search_input.fill(SEARCH_TERM)
+            # Wait for the search to actually answer instead of sleeping through the debounce
+            try:
+                await page.wait_for_event(
+                    "response",
+                    predicate=is_search_response,
+                    timeout=5000)
+            except Exception:
+                pass
+            await page.wait_for_selector(GAME_CARD_SELECTOR)
+    finally:
+        page.remove_listener("response", capture)
+    return payloads
+
+
+class GameCatalog:
+    """On-disk index of discovered trivia games, with recency-weighted selection."""
+
+    def __init__(self, path=None, ttl=None, recent_window=None):
+        self.path = Path(path or os.getenv('CATALOG_PATH', 'game_catalog.json'))
+        self.ttl = ttl or float(os.getenv('CATALOG_TTL', '21600'))
+        self.recent_window = recent_window or int(os.getenv('CATALOG_RECENT_WINDOW', '5'))
+        self.url_template = os.getenv('GAME_URL_TEMPLATE')
+        self.games = {}
+        self.history = []
+        self.updated_at = 0
+        self._lock = asyncio.Lock()
+        self.load()
+
+    def load(self):
+        if not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text())
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable game catalog {self.path}: {e}")
+            return
+        self.games = {game['id']: game for game in data.get('games', [])}
+        self.history = data.get('history', [])
+        self.updated_at = data.get('updated_at', 0)
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+        tmp_path.write_text(json.dumps({
+            'updated_at': self.updated_at,
+            'games': list(self.games.values()),
+            'history': self.history,
+        }, indent=2))
+        os.replace(tmp_path, self.path)
+
+    def is_fresh(self):
+        return bool(self.games) and time.time() - self.updated_at < self.ttl
+
+    async def refresh(self, page):
+        """Index the trivia search results. Expects the page on /host/discover and leaves it on the results.
+
+        Returns False without touching the page if another lobby refreshed the catalog meanwhile.
+        """
+        async with self._lock:
+            if self.is_fresh():
+                return False
+
+            payloads = await search_trivia(page)
+            titles = [await card_title(card) for card in await page.query_selector_all(GAME_CARD_SELECTOR)]
+            titles = [title for title in titles if title]
+
+            # Only keep payload entries that are actually on screen as a card
+            games = []
+            for payload in payloads:
+                games.extend(game for game in extract_games(payload) if game['title'] in titles)
+
+            if not games:
+                # No usable API payload - fall back to the card titles
+                games = [{'id': title, 'title': title, 'url': None} for title in titles]
+
+            if not games:
+                raise Exception("No trivia games found")
+
+            known_urls = {game_id: game.get('url') for game_id, game in self.games.items()}
+            self.games = {}
+            for game in games:
+                if not game['url']:
+                    game['url'] = known_urls.get(game['id'])
+                if not game['url'] and self.url_template and game['id'] != game['title']:
+                    game['url'] = self.url_template.format(id=game['id'])
+                self.games[game['id']] = game
+
+            self.updated_at = time.time()
+            self.save()
+            print(f"Indexed {len(self.games)} trivia games")
+            return True
+
+    def choose(self):
+        games = list(self.games.values())
+        if not games:
+            raise Exception("Game catalog is empty")
+
+        # Never-played games weigh 1; the last game played weighs 0 and recovers over recent_window games
+        recent = list(reversed(self.history[-self.recent_window:]))
+        weights = []
+        for game in games:
+            if game['id'] in recent:
+                weights.append(recent.index(game['id']) / self.recent_window)
+            else:
+                weights.append(1.0)
+
+        if not any(weights):
+            return random.choice(games)
+        return random.choices(games, weights=weights)[0]
+
+    def record_played(self, game_id):
+        self.history.append(game_id)
+        self.history = self.history[-max(self.recent_window, 50):]
+        self.save()
+
+    async def find_card(self, page, game):
+        for card in await page.query_selector_all(GAME_CARD_SELECTOR):
+            if await card_title(card) == game['title']:
+                return card
+
+        # The index is out of date for this game; forget it so the next pick is a different one
+        self.remove(game['id'])
+        raise Exception(f"'{game['title']}' is no longer in the trivia results")
+
+    def remove(self, game_id):
+        if self.games.pop(game_id, None):
+            self.save()
+
+    def set_url(self, game_id, url):
+        if game_id in self.games and self.games[game_id].get('url') != url:
+            self.games[game_id]['url'] = url
+            self.save()
@@ -0,0 +1,53 @@
+import os
+import re
+
+BROWSER_MODES = ('headed', 'headless', 'offscreen')
+HEAVY_RESOURCE_TYPES = {'image', 'font', 'media'}
+TRACKER_PATTERN = re.compile(
+    r"google-analytics\.com|googletagmanager\.com|doubleclick\.net|facebook\.net|"
+    r"hotjar\.com|segment\.(io|com)|mixpanel\.com|clarity\.ms|amplitude\.com")
+
+
+def is_lean():
+    return os.getenv('LEAN_MODE', 'false').lower() in ('1', 'true', 'yes')
+
+
+def launch_options():
+    mode = os.getenv('BROWSER_MODE', 'headed')
+    if mode not in BROWSER_MODES:
+        raise ValueError(f"BROWSER_MODE must be one of {', '.join(BROWSER_MODES)}")
+
+    args = ['--disable-web-security']
+    if mode == 'offscreen':
+        # Still renders like a normal window, just out of sight of the desktop
+        args.append('--window-position=-32000,-32000')
+    # An empty BROWSER_CHANNEL uses Playwright's bundled Chromium instead of branded Chrome
+    channel = os.getenv('BROWSER_CHANNEL', 'chrome') or None
+    return {'channel': channel, 'headless': mode == 'headless', 'args': args}
+
+
+def should_block(request):
+    if TRACKER_PATTERN.search(request.url):
+        return True
+    if request.resource_type not in HEAVY_RESOURCE_TYPES:
+        return False
+    try:
+        page_url = request.frame.url
+    except Exception:
+        return False
+    # The trivia host page is what goes on stream, so it keeps its images and fonts
+    return '/trivia/' not in page_url
+
+
+async def route_request(route):
+    if should_block(route.request):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+async def new_context(browser, **kwargs):
+    context = await browser.new_context(**kwargs)
+    if is_lean():
+        await context.route("**/*", route_request)
+    return context
@@ -0,0 +1,156 @@
+import asyncio
+import os
+from enum import Enum
+
+from metrics import metrics
+
+
+class LobbyState(Enum):
+    DISCOVER = 'discover'
+    HOSTING = 'hosting'
+    LOBBY = 'lobby'
+    COUNTDOWN = 'countdown'
+    IN_GAME = 'in_game'
+    SCORES = 'scores'
+
+
+class SessionExpired(Exception):
+    pass
+
+
+class StatePolicy:
+    def __init__(self, timeout, retries=0, backoff=2.0, max_backoff=60.0, exclusive=False):
+        self.timeout = timeout
+        self.retries = retries
+        self.exclusive = exclusive
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    def delay(self, attempt):
+        return min(self.backoff * 2 ** (attempt - 1), self.max_backoff)
+
+
+# Timeouts are in seconds and bound a whole state, including any waiting it does.
+# Exclusive states hold one of the engine's slots while they run (see MAX_CONCURRENT_LOBBIES).
+DEFAULT_POLICIES = {
+    LobbyState.DISCOVER: StatePolicy(timeout=90, retries=3, exclusive=True),
+    LobbyState.HOSTING: StatePolicy(timeout=90, retries=2, exclusive=True),
+    LobbyState.LOBBY: StatePolicy(timeout=720),
+    LobbyState.COUNTDOWN: StatePolicy(timeout=90),
+    LobbyState.IN_GAME: StatePolicy(timeout=3600),
+    LobbyState.SCORES: StatePolicy(timeout=150),
+}
+
+
+class NullSlot:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class LobbyScheduler:
+    """Drives one bot through DISCOVER -> HOSTING -> LOBBY -> COUNTDOWN -> IN_GAME -> SCORES, forever.
+
+    Each pass through the states is one cycle. Between cycles the scheduler decides whether the
+    bot's page or context has to be recycled, based on errors, renderer memory and session validity.
+
+    The slot only guards the heavy steps - login, context recycling and the exclusive states - so a
+    lobby waiting for players never keeps another lobby from getting its join code on screen.
+    """
+
+    def __init__(self, bot, slot=None, policies=None):
+        self.bot = bot
+        self.slot = slot or NullSlot()
+        self.policies = {**DEFAULT_POLICIES, **(policies or {})}
+        self.max_errors = int(os.getenv('RECYCLE_AFTER_ERRORS', '3'))
+        self.memory_limit_mb = float(os.getenv('RECYCLE_MEMORY_MB', '512'))
+        self.cycle_backoff = StatePolicy(timeout=None, backoff=5.0, max_backoff=300.0)
+        self.consecutive_errors = 0
+        self.failed_cycles = 0
+
+    async def run(self):
+        while True:
+            try:
+                async with self.slot:
+                    await self.prepare_cycle()
+                completed = await self.run_cycle()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.bot.log(f"Error: {e}")
+                metrics.inc('happyslap_errors_total', type=type(e).__name__, lobby=self.bot.lobby_id)
+                self.consecutive_errors += 1
+                completed = False
+
+            if completed:
+                self.failed_cycles = 0
+            else:
+                self.failed_cycles += 1
+                await asyncio.sleep(self.cycle_backoff.delay(self.failed_cycles))
+
+    async def prepare_cycle(self):
+        bot = self.bot
+        if await bot.should_refresh_login():
+            bot.log("Session refresh needed - reopening context...")
+            metrics.inc('happyslap_context_recycles_total', reason='session', lobby=bot.lobby_id)
+            await bot.login()
+            self.consecutive_errors = 0
+            return
+
+        if self.consecutive_errors >= self.max_errors:
+            bot.log(f"{self.consecutive_errors} errors in a row - recycling context...")
+            metrics.inc('happyslap_context_recycles_total', reason='errors', lobby=bot.lobby_id)
+            await bot.login()
+            self.consecutive_errors = 0
+            return
+
+        memory_mb = await bot.renderer_memory_mb()
+        metrics.set('happyslap_browser_memory_mb', round(memory_mb, 1), lobby=bot.lobby_id)
+        if memory_mb > self.memory_limit_mb:
+            bot.log(f"Renderer heap at {memory_mb:.0f}MB - recycling context...")
+            metrics.inc('happyslap_context_recycles_total', reason='memory', lobby=bot.lobby_id)
+            await bot.login()
+
+    async def run_cycle(self):
+        """Run the states from DISCOVER until the lobby hands back to DISCOVER. Returns False on failure."""
+        bot = self.bot
+        state = LobbyState.DISCOVER
+        attempts = 0
+
+        while True:
+            policy = self.policies[state]
+            try:
+                # Waiting for a slot doesn't count against the state's timeout
+                async with self.slot if policy.exclusive else NullSlot():
+                    with metrics.timer(state.value, lobby=bot.lobby_id):
+                        next_state = await asyncio.wait_for(bot.handlers[state](), policy.timeout)
+            except asyncio.CancelledError:
+                raise
+            except SessionExpired as e:
+                bot.log(f"{e}")
+                metrics.inc('happyslap_errors_total', type=type(e).__name__, lobby=bot.lobby_id)
+                return False
+            except Exception as e:
+                metrics.inc('happyslap_errors_total', type=type(e).__name__, lobby=bot.lobby_id)
+                if isinstance(e, asyncio.TimeoutError):
+                    e = f"timed out after {policy.timeout}s"
+                self.consecutive_errors += 1
+                if attempts < policy.retries:
+                    attempts += 1
+                    delay = policy.delay(attempts)
+                    bot.log(f"{state.name} failed ({e}) - retry {attempts}/{policy.retries} in {delay:.0f}s")
+                    await asyncio.sleep(delay)
+                    continue
+
+                # Don't keep using a page that may be broken: start the next cycle on a fresh one
+                bot.log(f"{state.name} failed ({e}) - starting over on a new page")
+                await bot.reset_page()
+                return False
+
+            attempts = 0
+            if next_state is LobbyState.DISCOVER:
+                self.consecutive_errors = 0
+                return True
+            state = next_state
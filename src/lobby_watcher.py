@@ -0,0 +1,111 @@
+import asyncio
+import time
+
+PLAYER_SELECTOR = '[class*="grid-cols-4"] > div'
+BINDING_NAME = '__happyslapLobbyEvent'
+
+# Runs in the page: watches the DOM and pushes lobby state to Python only when it changes.
+# Safe to evaluate more than once per document - later calls just re-report the current state.
+WATCHER_SCRIPT = """(() => {
+    if (window.__happyslapWatcher) {
+        return window.__happyslapWatcher.report(true);
+    }
+
+    const last = { players: -1, ended: null };
+    let scheduled = false;
+
+    // Only buttons can be "Restart Game"; matching every element's text walks the whole document
+    const restartVisible = () => document.evaluate(
+        "//button[normalize-space(.)='Restart Game'] | //*[@role='button'][normalize-space(.)='Restart Game']",
+        document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null
+    ).singleNodeValue !== null;
+
+    const report = (force) => {
+        scheduled = false;
+        const players = document.querySelectorAll('%s').length;
+        const ended = restartVisible();
+        const changed = players !== last.players || ended !== last.ended;
+        last.players = players;
+        last.ended = ended;
+        if ((force || changed) && window.%s) {
+            window.%s({ players, ended });
+        }
+        return { players, ended };
+    };
+
+    // Coalesce bursts of mutations (React re-renders) into a single report
+    const schedule = () => {
+        if (!scheduled) {
+            scheduled = true;
+            setTimeout(() => report(false), 50);
+        }
+    };
+
+    // Our own countdown overlay changes several times a second and never affects the lobby state
+    const outsideOverlay = (record) => {
+        const node = record.target.nodeType === Node.ELEMENT_NODE ? record.target : record.target.parentElement;
+        return !(node && node.closest('#countdown-overlay'));
+    };
+
+    new MutationObserver((records) => {
+        if (records.some(outsideOverlay)) {
+            schedule();
+        }
+    }).observe(document, {
+        childList: true,
+        subtree: true,
+        characterData: true,
+    });
+
+    window.__happyslapWatcher = { report };
+    return report(true);
+})()""" % (PLAYER_SELECTOR, BINDING_NAME, BINDING_NAME)
+
+
+class LobbyWatcher:
+    def __init__(self, page, on_change=None):
+        self.page = page
+        self.on_change = on_change
+        self.player_count = 0
+        self.game_ended = False
+        self._changed = asyncio.Event()
+        self._installed = False
+
+    async def install(self):
+        # Bindings and init scripts survive navigations, so this only needs to happen once per page
+        if self._installed:
+            return
+        await self.page.expose_binding(BINDING_NAME, self._on_event)
+        await self.page.add_init_script(WATCHER_SCRIPT)
+        self._installed = True
+
+    async def attach(self):
+        await self.install()
+        state = await self.page.evaluate(WATCHER_SCRIPT)
+        self._update(state)
+
+    def _on_event(self, source, state):
+        if source.get('frame') is not self.page.main_frame:
+            return
+        self._update(state)
+        self._changed.set()
+
+    def _update(self, state):
+        self.player_count = state['players']
+        self.game_ended = state['ended']
+        if self.on_change:
+            self.on_change(self)
+
+    async def wait_for(self, predicate, timeout=None):
+        """Wait until predicate(watcher) is true. Returns False if the timeout (seconds) runs out first."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not predicate(self):
+            self._changed.clear()
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            try:
+                await asyncio.wait_for(self._changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                return predicate(self)
+        return True
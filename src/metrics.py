@@ -0,0 +1,143 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, float('inf'))
+
+METRIC_HELP = {
+    'happyslap_phase_seconds': ('histogram', "Time spent in each bot phase"),
+    'happyslap_games_hosted_total': ('counter', "Lobbies opened with a join code"),
+    'happyslap_games_completed_total': ('counter', "Games that reached the scoreboard"),
+    'happyslap_lobby_timeouts_total': ('counter', "Lobbies abandoned because nobody joined"),
+    'happyslap_login_refreshes_total': ('counter', "Full UI logins performed"),
+    'happyslap_context_recycles_total': ('counter', "Browser contexts recreated, by reason"),
+    'happyslap_errors_total': ('counter', "Errors raised by lobby states, by exception type"),
+    'happyslap_players': ('gauge', "Players currently in the lobby"),
+    'happyslap_browser_memory_mb': ('gauge', "JS heap used by the lobby's page, in MB"),
+}
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_text(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+
+class Metrics:
+    """In-process counters, gauges and histograms, served as Prometheus text and optionally logged to JSONL."""
+
+    def __init__(self):
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.jsonl = None
+        self.server = None
+        self._lock = threading.Lock()
+
+    def configure_from_env(self):
+        port = os.getenv('METRICS_PORT', '9464')
+        if port and not self.server:
+            self.serve(int(port), os.getenv('METRICS_HOST', '127.0.0.1'))
+        path = os.getenv('METRICS_JSONL')
+        if path and not self.jsonl:
+            self.jsonl = open(path, 'a', buffering=1)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+        self._log('counter', name, amount, labels)
+
+    def set(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.gauges[key] = value
+        self._log('gauge', name, value, labels)
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            buckets, total, count = self.histograms.get(key, ([0] * len(BUCKETS), 0.0, 0))
+            buckets = [n + (value <= bound) for n, bound in zip(buckets, BUCKETS)]
+            self.histograms[key] = (buckets, total + value, count + 1)
+        self._log('histogram', name, value, labels)
+
+    @contextmanager
+    def timer(self, phase, **labels):
+        started = time.monotonic()
+        outcome = 'error'
+        try:
+            yield
+            outcome = 'ok'
+        finally:
+            self.observe('happyslap_phase_seconds', time.monotonic() - started,
+                         phase=phase, outcome=outcome, **labels)
+
+    def _log(self, kind, name, value, labels):
+        if not self.jsonl:
+            return
+        line = json.dumps({'ts': time.time(), 'type': kind, 'name': name, 'value': value, 'labels': labels})
+        with self._lock:
+            self.jsonl.write(line + '\n')
+
+    def render(self):
+        """Prometheus text exposition format."""
+        with self._lock:
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+            histograms = dict(self.histograms)
+
+        lines = []
+        for name, (kind, help_text) in METRIC_HELP.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == 'histogram':
+                for (metric, labels), (buckets, total, count) in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    for bound, n in zip(BUCKETS, buckets):
+                        le = '+Inf' if bound == float('inf') else f'{bound:g}'
+                        lines.append(f"{name}_bucket{_label_text(labels, [('le', le)])} {n}")
+                    lines.append(f"{name}_sum{_label_text(labels)} {total}")
+                    lines.append(f"{name}_count{_label_text(labels)} {count}")
+            else:
+                values = counters if kind == 'counter' else gauges
+                for (metric, labels), value in sorted(values.items()):
+                    if metric == name:
+                        lines.append(f"{name}{_label_text(labels)} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port, host='127.0.0.1'):
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        print(f"Metrics on http://{host}:{self.server.server_address[1]}/metrics")
+
+
+# Shared by every lobby in the process
+metrics = Metrics()
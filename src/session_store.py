@@ -0,0 +1,141 @@
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+
+import requests
+
+from lean_mode import new_context
+from metrics import metrics
+
+BASE_URL = os.getenv('HAPPYSLAP_URL', "https://happyslap.tv").rstrip('/')
+
+
+class SessionStore:
+    """Keeps one authenticated storage_state on disk and shares it between all lobbies."""
+
+    def __init__(self, path=None, probe_interval=None):
+        self.path = Path(path or os.getenv('SESSION_STATE_PATH', 'session_state.json'))
+        self.probe_interval = probe_interval or float(os.getenv('SESSION_PROBE_INTERVAL', '300'))
+        self.email = os.getenv('EMAIL')
+        self.password = os.getenv('PASSWORD')
+        self.state = None
+        self.version = 0
+        self.last_probe_time = None
+        self.last_probe_ok = False
+        self.expired = False
+        self._lock = asyncio.Lock()
+
+        if not self.email or not self.password:
+            raise ValueError("EMAIL and PASSWORD must be set in .env file")
+
+    def load(self):
+        if not self.path.exists():
+            return None
+        try:
+            data = json.loads(self.path.read_text())
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable session file {self.path}: {e}")
+            return None
+        # Never reuse cookies for another account or site after EMAIL or HAPPYSLAP_URL changes
+        if not isinstance(data, dict) or data.get('email') != self.email or data.get('base_url') != BASE_URL:
+            print(f"Ignoring session file {self.path}: it was not saved for this account on {BASE_URL}")
+            return None
+        return data.get('state')
+
+    def save(self, state):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+        # Holds live auth cookies, so keep it private to the bot's user
+        tmp_path.unlink(missing_ok=True)
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            f.write(json.dumps({'email': self.email, 'base_url': BASE_URL, 'state': state}))
+        os.replace(tmp_path, self.path)
+
+    def invalidate(self, version):
+        # Ignore reports about a session that has already been replaced by a newer login
+        if version == self.version:
+            self.expired = True
+
+    async def get_state(self, browser):
+        """Return a storage_state that is believed to be logged in, logging in only when needed."""
+        async with self._lock:
+            if self.state is None:
+                self.state = self.load()
+                if self.state is not None:
+                    self.version += 1
+
+            if self.state is not None and await self.is_valid():
+                return self.state
+
+            with metrics.timer('login'):
+                await self.login(browser)
+            return self.state
+
+    async def is_valid(self):
+        if self.state is None or self.expired:
+            return False
+        if self.last_probe_time and time.monotonic() - self.last_probe_time < self.probe_interval:
+            return self.last_probe_ok
+
+        self.last_probe_ok = await asyncio.to_thread(self.probe, self.state)
+        self.last_probe_time = time.monotonic()
+        return self.last_probe_ok
+
+    @staticmethod
+    def probe(state):
+        now = time.time()
+        cookies = [c for c in state.get('cookies', [])
+                   if c.get('expires', -1) in (-1, None) or c['expires'] > now]
+        if not cookies:
+            return False
+
+        http = requests.Session()
+        for cookie in cookies:
+            http.cookies.set(cookie['name'], cookie['value'],
+                             domain=cookie.get('domain'), path=cookie.get('path', '/'))
+        try:
+            response = http.get(f"{BASE_URL}/host", allow_redirects=False, timeout=5)
+        except requests.RequestException as e:
+            # Can't tell from here - keep the session and let the page navigation decide
+            print(f"Session probe failed ({e}), keeping stored session")
+            return True
+
+        if response.status_code in (401, 403):
+            return False
+        if response.is_redirect and '/login' in response.headers.get('Location', ''):
+            return False
+        return response.ok
+
+    async def login(self, browser):
+        print("Logging in...")
+        metrics.inc('happyslap_login_refreshes_total')
+        context = await new_context(browser)
+        try:
+            page = await context.new_page()
+            await page.goto(f"{BASE_URL}/login")
+            await page.wait_for_selector("input[placeholder='Username or Email']")
+
+            print(f"Using email: {self.email}")
+            await page.fill("input[placeholder='Username or Email']", self.email)
+            await page.fill("input[placeholder='Password']", self.password)
+            await page.click("button:has-text('Login')")
+
+            try:
+                await page.wait_for_url(f"{BASE_URL}/host", timeout=5000)
+                print("Login successful!")
+            except Exception as e:
+                print("Login failed!")
+                raise e
+
+            self.state = await context.storage_state()
+        finally:
+            await context.close()
+
+        self.save(self.state)
+        self.version += 1
+        self.expired = False
+        self.last_probe_time = time.monotonic()
+        self.last_probe_ok = True
@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from game_catalog import GameCatalog, extract_games, is_search_response
+
+
+class FakeCard:
+    def __init__(self, text):
+        self.text = text
+
+    async def inner_text(self):
+        return self.text
+
+
+class FakePage:
+    def __init__(self, titles):
+        self.cards = [FakeCard(f"{title}\n12 questions") for title in titles]
+
+    async def query_selector_all(self, selector):
+        return self.cards
+
+
+class FakeResponse:
+    def __init__(self, url, content_type='application/json'):
+        self.url = url
+        self.headers = {'content-type': content_type}
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    catalog = GameCatalog(path=tmp_path / 'catalog.json')
+    catalog.games = {
+        'g1': {'id': 'g1', 'title': 'Trivia', 'url': None},
+        'g2': {'id': 'g2', 'title': 'Harry Potter Trivia', 'url': None},
+    }
+    return catalog
+
+
+def test_find_card_matches_the_whole_title(catalog):
+    page = FakePage(['Harry Potter Trivia', 'Trivia'])
+
+    card = asyncio.run(catalog.find_card(page, catalog.games['g1']))
+
+    assert card is page.cards[1]
+
+
+def test_find_card_miss_raises_and_forgets_the_game(catalog):
+    page = FakePage(['Harry Potter Trivia'])
+
+    with pytest.raises(Exception, match="no longer in the trivia results"):
+        asyncio.run(catalog.find_card(page, catalog.games['g1']))
+
+    assert 'g1' not in catalog.games
+    assert 'g2' in catalog.games
+
+
+def test_only_the_search_response_is_captured():
+    assert is_search_response(FakeResponse('https://happyslap.tv/api/games?q=Trivia'))
+    assert is_search_response(FakeResponse('https://happyslap.tv/api/search/trivia%20games'))
+    assert not is_search_response(FakeResponse('https://happyslap.tv/api/tags'))
+    assert not is_search_response(FakeResponse('https://happyslap.tv/trivia.png', 'image/png'))
+
+
+def test_search_payload_urls_are_not_trusted():
+    payload = {'results': [{'id': 'g1', 'title': 'Movie Trivia', 'url': 'https://example.com/phish'}]}
+
+    assert extract_games(payload) == [{'id': 'g1', 'title': 'Movie Trivia', 'url': None}]
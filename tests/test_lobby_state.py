@@ -0,0 +1,114 @@
+import asyncio
+
+from bot import HappySlapBot
+from lobby_state import DEFAULT_POLICIES, LobbyScheduler, LobbyState, StatePolicy
+
+
+class StubBot(HappySlapBot):
+    """Real discover/hosting handlers, with the browser work replaced by scripted results."""
+
+    def __init__(self, host_failures, **kwargs):
+        super().__init__(browser=None, session=None, catalog=None, **kwargs)
+        self.host_failures = host_failures
+        self.open_lobby_calls = []
+        self.hosted_holding_slot = []
+        self.pages_reset = 0
+        self.handlers[LobbyState.LOBBY] = self.end_cycle
+        self.log = lambda message: None
+
+    async def should_refresh_login(self):
+        return False
+
+    async def renderer_memory_mb(self):
+        return 0.0
+
+    async def pick_game(self, page):
+        await asyncio.sleep(0)
+        return {'id': 'g1', 'title': 'Movie Trivia'}, True
+
+    async def open_lobby(self, page, game, on_results=False):
+        self.open_lobby_calls.append((game['id'], on_results))
+        if isinstance(self.slot, asyncio.Semaphore):
+            self.hosted_holding_slot.append(self.slot.locked())
+        await asyncio.sleep(0)
+        if len(self.open_lobby_calls) <= self.host_failures:
+            raise Exception("Host Game click failed")
+        return 'ABCDE'
+
+    async def end_cycle(self):
+        return LobbyState.DISCOVER
+
+    async def reset_page(self):
+        self.pages_reset += 1
+
+
+def fast_policies():
+    return {state: StatePolicy(timeout=5, retries=policy.retries, backoff=0, exclusive=policy.exclusive)
+            for state, policy in DEFAULT_POLICIES.items()}
+
+
+def test_hosting_retry_reuses_the_picked_game():
+    bot = StubBot(host_failures=1)
+    scheduler = LobbyScheduler(bot, policies=fast_policies())
+
+    completed = asyncio.run(scheduler.run_cycle())
+
+    assert completed
+    assert bot.current_join_code == 'ABCDE'
+    assert bot.next_game is None
+    # The retry can't assume the page is still on the search results
+    assert bot.open_lobby_calls == [('g1', True), ('g1', False)]
+    assert bot.pages_reset == 0
+
+
+def test_hosting_gives_up_after_its_retries():
+    bot = StubBot(host_failures=10)
+    scheduler = LobbyScheduler(bot, policies=fast_policies())
+
+    completed = asyncio.run(scheduler.run_cycle())
+
+    retries = DEFAULT_POLICIES[LobbyState.HOSTING].retries
+    assert not completed
+    assert len(bot.open_lobby_calls) == retries + 1
+    assert scheduler.consecutive_errors == retries + 1
+    assert bot.pages_reset == 1
+
+
+def test_policy_overrides_keep_the_other_defaults():
+    override = StatePolicy(timeout=1, retries=7)
+    scheduler = LobbyScheduler(StubBot(host_failures=0), policies={LobbyState.HOSTING: override})
+
+    assert scheduler.policies[LobbyState.HOSTING] is override
+    assert scheduler.policies[LobbyState.DISCOVER] is DEFAULT_POLICIES[LobbyState.DISCOVER]
+
+
+def test_capped_lobbies_only_share_the_slot_while_hosting():
+    async def run_two_lobbies():
+        slot = asyncio.Semaphore(1)
+        bots = [StubBot(host_failures=0, lobby_id=i + 1, semaphore=slot) for i in range(2)]
+        in_lobby = set()
+        both_in_lobby = asyncio.Event()
+
+        async def lobby(bot):
+            in_lobby.add(bot.lobby_id)
+            if len(in_lobby) == len(bots):
+                both_in_lobby.set()
+            # Stay in the lobby: with the slot held for the whole cycle the other one never hosts
+            await asyncio.Event().wait()
+
+        for bot in bots:
+            bot.handlers[LobbyState.LOBBY] = lambda bot=bot: lobby(bot)
+        tasks = [asyncio.create_task(bot.start()) for bot in bots]
+        try:
+            await asyncio.wait_for(both_in_lobby.wait(), timeout=5)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        return bots, slot
+
+    bots, slot = asyncio.run(run_two_lobbies())
+
+    assert all(bot.current_join_code == 'ABCDE' for bot in bots)
+    assert all(bot.hosted_holding_slot == [True] for bot in bots)
+    assert not slot.locked()
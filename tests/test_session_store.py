@@ -0,0 +1,41 @@
+import json
+
+import pytest
+
+from session_store import SessionStore
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setenv('EMAIL', 'host@example.com')
+    monkeypatch.setenv('PASSWORD', 'secret')
+    return SessionStore(path=tmp_path / 'session_state.json')
+
+
+STATE = {'cookies': [{'name': 'session', 'value': 'abc'}], 'origins': []}
+
+
+def test_saved_state_loads_back_for_the_same_account(store):
+    store.save(STATE)
+
+    assert store.load() == STATE
+    assert store.path.stat().st_mode & 0o777 == 0o600
+
+
+def test_state_saved_for_another_account_is_ignored(store, monkeypatch):
+    store.save(STATE)
+    monkeypatch.setenv('EMAIL', 'someone-else@example.com')
+
+    assert SessionStore(path=store.path).load() is None
+
+
+def test_state_saved_for_another_site_is_ignored(store):
+    store.path.write_text(json.dumps({'email': store.email, 'base_url': 'https://example.invalid', 'state': STATE}))
+
+    assert store.load() is None
+
+
+def test_bare_storage_state_from_older_versions_is_ignored(store):
+    store.path.write_text(json.dumps(STATE))
+
+    assert store.load() is None